@@ -1,9 +1,21 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, text, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from flask_cors import CORS
 from datetime import datetime
 import os
 from functools import wraps
+from collections import OrderedDict
+from contextlib import contextmanager
+import itertools
+from markupsafe import Markup
+import hashlib
+import hmac
+import threading
+import sqlite3
+import time
 import requests
 import json
 
@@ -26,6 +38,41 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
+# Cache des fragments du tableau de bord (FRAGMENT_CACHE_PATH : fichier SQLite partagé entre workers)
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 64))
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+app.config['FRAGMENT_CACHE_PATH'] = os.environ.get('FRAGMENT_CACHE_PATH')
+# Sans fichier partagé, un worker ne voit pas les invalidations des autres : durée de vie bornée (secondes)
+app.config['FRAGMENT_CACHE_TTL'] = float(os.environ.get('FRAGMENT_CACHE_TTL', 10))
+# Avec fichier partagé, filet de sécurité si une invalidation n'a pas pu être écrite (secondes)
+app.config['FRAGMENT_CACHE_SHARED_TTL'] = float(os.environ.get('FRAGMENT_CACHE_SHARED_TTL', 300))
+
+# Flux des modifications lu par le site principal (/api/changes)
+app.config['CHANGES_PAGE_SIZE'] = int(os.environ.get('CHANGES_PAGE_SIZE', 100))
+app.config['CHANGES_PAGE_MAX'] = int(os.environ.get('CHANGES_PAGE_MAX', 1000))
+
+# Limites des appels vers le site principal, par processus (requêtes/s, rafale, appels simultanés)
+app.config['OUTBOUND_LIMITS'] = {
+    endpoint_class: {
+        'rate': float(os.environ.get(f'OUTBOUND_{prefix}RATE', rate)),
+        'burst': int(os.environ.get(f'OUTBOUND_{prefix}BURST', burst)),
+        'concurrency': int(os.environ.get(f'OUTBOUND_{prefix}CONCURRENCY', concurrency)),
+    }
+    for endpoint_class, prefix, rate, burst, concurrency in [
+        ('global', '', 10, 10, 4),
+        ('interactive', 'INTERACTIVE_', 10, 10, 4),
+        ('delete', 'DELETE_', 5, 5, 2),
+        ('bulk', 'BULK_', 2, 2, 1),
+        ('health', 'HEALTH_', 1, 2, 1),
+    ]
+}
+for endpoint_class, conf in app.config['OUTBOUND_LIMITS'].items():
+    if conf['rate'] <= 0 or conf['burst'] < 1 or conf['concurrency'] < 1:
+        raise ValueError(f"Limites sortantes invalides pour '{endpoint_class}' "
+                         f"(rate > 0, burst >= 1, concurrency >= 1 attendus): {conf}")
+app.config['OUTBOUND_QUEUE_TIMEOUT'] = float(os.environ.get('OUTBOUND_QUEUE_TIMEOUT', 30))
+app.config['OUTBOUND_HEALTH_QUEUE_TIMEOUT'] = float(os.environ.get('OUTBOUND_HEALTH_QUEUE_TIMEOUT', 1))
+
 # Initialisation de la base de données
 db = SQLAlchemy(app)
 
@@ -45,6 +92,14 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def api_key_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not API_KEY or not hmac.compare_digest(request.headers.get('X-API-Key', '').encode(), API_KEY.encode()):
+            return jsonify({'success': False, 'message': 'Clé API invalide'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
 # --- MODÈLES ---
 class Activite(db.Model):
     __tablename__ = 'activites'
@@ -101,7 +156,193 @@ class Offre(db.Model):
     sync_status = db.Column(db.String(20), default='pending')
     sync_message = db.Column(db.Text)
 
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    # AUTOINCREMENT : un id supprimé lors du compactage n'est jamais réattribué (curseur)
+    __table_args__ = (db.UniqueConstraint('type', 'item_id', name='uq_change_log_item'), {'sqlite_autoincrement': True})
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(20), nullable=False)
+    item_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)
+    date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+
+# --- PLANIFICATEUR DES APPELS AU SITE PRINCIPAL ---
+class OutboundQueueTimeout(Exception):
+    pass
+
+class OutboundScheduler:
+    """Limite les appels sortants vers le site principal.
+
+    Un seau à jetons et un plafond d'appels simultanés s'appliquent à
+    l'ensemble des appels (`global`) et à chaque classe d'appel. Les appels
+    en attente passent par ordre de priorité : sauvegardes interactives,
+    puis suppressions, puis synchronisation en masse, puis vérifications
+    de santé. Les limites sont partagées entre les threads d'un même processus.
+    """
+
+    PRIORITIES = {'interactive': 0, 'delete': 1, 'bulk': 2, 'health': 3}
+
+    def __init__(self, limits, queue_timeout):
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = []
+        now = time.monotonic()
+        self._buckets = {name: {'limits': conf, 'tokens': float(conf['burst']), 'updated': now, 'active': 0}
+                         for name, conf in limits.items()}
+        self._metrics = {name: {'requests': 0, 'timeouts': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+                         for name in self.PRIORITIES}
+
+    def _refill(self, now):
+        for bucket in self._buckets.values():
+            conf = bucket['limits']
+            bucket['tokens'] = min(conf['burst'], bucket['tokens'] + (now - bucket['updated']) * conf['rate'])
+            bucket['updated'] = now
+
+    def _blocked_for(self, name):
+        """0 si un appel peut partir, sinon le délai avant le prochain jeton (None : attendre une libération)"""
+        bucket = self._buckets[name]
+        if bucket['active'] >= bucket['limits']['concurrency']:
+            return None
+        if bucket['tokens'] < 1:
+            return (1 - bucket['tokens']) / bucket['limits']['rate']
+        return 0
+
+    def _next_delay(self, ticket):
+        """0 si `ticket` est le prochain appel à partir, sinon le délai d'attente maximal"""
+        delay = self._blocked_for('global')
+        if delay != 0:
+            return delay
+        delays = []
+        for waiting, endpoint_class in sorted(self._waiting):
+            class_delay = self._blocked_for(endpoint_class)
+            if class_delay == 0:
+                if waiting == ticket:
+                    return 0
+                # Un appel plus prioritaire peut partir : le réveiller
+                self._cond.notify_all()
+                return None
+            if class_delay is not None:
+                delays.append(class_delay)
+        return min(delays) if delays else None
+
+    def acquire(self, endpoint_class, queue_timeout=None):
+        ticket = (self.PRIORITIES[endpoint_class], next(self._seq))
+        start = time.monotonic()
+        deadline = start + (self.queue_timeout if queue_timeout is None else queue_timeout)
+        with self._cond:
+            self._waiting.append((ticket, endpoint_class))
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._next_delay(ticket)
+                    if delay == 0:
+                        break
+                    if now >= deadline:
+                        self._metrics[endpoint_class]['timeouts'] += 1
+                        raise OutboundQueueTimeout(f"File d'attente {endpoint_class} saturée")
+                    self._cond.wait(deadline - now if delay is None else min(delay, deadline - now))
+            finally:
+                self._waiting.remove((ticket, endpoint_class))
+                self._cond.notify_all()
+
+            for name in ('global', endpoint_class):
+                self._buckets[name]['tokens'] -= 1
+                self._buckets[name]['active'] += 1
+            waited = time.monotonic() - start
+            metrics = self._metrics[endpoint_class]
+            metrics['requests'] += 1
+            metrics['wait_total'] += waited
+            metrics['wait_max'] = max(metrics['wait_max'], waited)
+
+    def release(self, endpoint_class):
+        with self._cond:
+            for name in ('global', endpoint_class):
+                self._buckets[name]['active'] -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, endpoint_class, queue_timeout=None):
+        self.acquire(endpoint_class, queue_timeout)
+        try:
+            yield
+        finally:
+            self.release(endpoint_class)
+
+    def metrics(self):
+        """Temps d'attente en file par classe d'appel (secondes)"""
+        with self._cond:
+            queued = {name: 0 for name in self.PRIORITIES}
+            for _, endpoint_class in self._waiting:
+                queued[endpoint_class] += 1
+            return {
+                name: {
+                    'requests': m['requests'],
+                    'timeouts': m['timeouts'],
+                    'queued': queued[name],
+                    'active': self._buckets[name]['active'],
+                    'wait_avg': round(m['wait_total'] / m['requests'], 4) if m['requests'] else 0.0,
+                    'wait_max': round(m['wait_max'], 4),
+                }
+                for name, m in self._metrics.items()
+            }
+
+outbound_scheduler = OutboundScheduler(app.config['OUTBOUND_LIMITS'], app.config['OUTBOUND_QUEUE_TIMEOUT'])
+
+def site_request(method, path, endpoint_class='interactive', queue_timeout=None, **kwargs):
+    """Appel au site principal, soumis au planificateur"""
+    with outbound_scheduler.slot(endpoint_class, queue_timeout):
+        return requests.request(method, f"{SITE_URL}{path}", **kwargs)
+
 # --- FONCTIONS DE SYNCHRONISATION ---
+def activite_to_dict(activite):
+    return {
+        'id': str(activite.id),
+        'titre': activite.titre,
+        'description': activite.description or '',
+        'contenu': activite.contenu or '',
+        'image_url': activite.image_url or '',
+        'auteur': activite.auteur or 'Admin',
+        'est_publie': activite.est_publie,
+        'date_creation': activite.date_creation.isoformat() if activite.date_creation else datetime.utcnow().isoformat()
+    }
+
+def realisation_to_dict(realisation):
+    return {
+        'id': str(realisation.id),
+        'titre': realisation.titre,
+        'description': realisation.description or '',
+        'image_url': realisation.image_url or '',
+        'categorie': realisation.categorie or '',
+        'date_realisation': realisation.date_realisation.isoformat() if realisation.date_realisation else None,
+        'date_creation': realisation.date_creation.isoformat() if realisation.date_creation else datetime.utcnow().isoformat()
+    }
+
+def annonce_to_dict(annonce):
+    return {
+        'id': str(annonce.id),
+        'titre': annonce.titre,
+        'contenu': annonce.contenu or '',
+        'type_annonce': annonce.type_annonce or 'info',
+        'date_debut': annonce.date_debut.isoformat() if annonce.date_debut else None,
+        'date_fin': annonce.date_fin.isoformat() if annonce.date_fin else None,
+        'date_creation': annonce.date_creation.isoformat() if annonce.date_creation else datetime.utcnow().isoformat(),
+        'est_active': annonce.est_active
+    }
+
+def offre_to_dict(offre):
+    return {
+        'id': str(offre.id),
+        'titre': offre.titre,
+        'description': offre.description or '',
+        'type_offre': offre.type_offre or 'autre',
+        'lieu': offre.lieu or '',
+        'date_limite': offre.date_limite.isoformat() if offre.date_limite else None,
+        'date_creation': offre.date_creation.isoformat() if offre.date_creation else datetime.utcnow().isoformat(),
+        'est_active': offre.est_active
+    }
+
 def get_api_headers():
     return {
         'Content-Type': 'application/json',
@@ -112,26 +353,22 @@ def check_site_connection():
     if not API_KEY:
         return False, "Clé API non configurée"
     try:
-        response = requests.get(f"{SITE_URL}/api/health", timeout=5)
+        # Priorité la plus basse : une sonde ne doit pas retarder les sauvegardes
+        response = site_request('GET', '/api/health', 'health',
+                                queue_timeout=app.config['OUTBOUND_HEALTH_QUEUE_TIMEOUT'], timeout=5)
         return response.status_code == 200, "Connecté" if response.status_code == 200 else f"Erreur {response.status_code}"
+    except OutboundQueueTimeout:
+        return False, "Vérification différée (site principal sollicité)"
     except:
         return False, "Site inaccessible"
 
-def sync_activite_to_site(activite):
+def sync_activite_to_site(activite, endpoint_class='interactive'):
     if not API_KEY or not activite.est_publie:
         return False, "Non synchronisé"
     try:
-        data = {
-            'id': str(activite.id),
-            'titre': activite.titre,
-            'description': activite.description or '',
-            'contenu': activite.contenu or '',
-            'image_url': activite.image_url or '',
-            'auteur': activite.auteur or 'Admin',
-            'est_publie': activite.est_publie,
-            'date_creation': activite.date_creation.isoformat() if activite.date_creation else datetime.utcnow().isoformat()
-        }
-        response = requests.post(f"{SITE_URL}/api/activites/{activite.id}", json=data, headers=get_api_headers(), timeout=10)
+        data = activite_to_dict(activite)
+        response = site_request('POST', f"/api/activites/{activite.id}", endpoint_class,
+                                json=data, headers=get_api_headers(), timeout=10)
         if response.status_code in [200, 201]:
             activite.last_sync = datetime.utcnow()
             activite.sync_status = 'success'
@@ -144,20 +381,13 @@ def sync_activite_to_site(activite):
         db.session.commit()
         return False, str(e)[:50]
 
-def sync_realisation_to_site(realisation):
+def sync_realisation_to_site(realisation, endpoint_class='interactive'):
     if not API_KEY:
         return False, "Clé API non configurée"
     try:
-        data = {
-            'id': str(realisation.id),
-            'titre': realisation.titre,
-            'description': realisation.description or '',
-            'image_url': realisation.image_url or '',
-            'categorie': realisation.categorie or '',
-            'date_realisation': realisation.date_realisation.isoformat() if realisation.date_realisation else None,
-            'date_creation': realisation.date_creation.isoformat() if realisation.date_creation else datetime.utcnow().isoformat()
-        }
-        response = requests.post(f"{SITE_URL}/api/realisations/{realisation.id}", json=data, headers=get_api_headers(), timeout=10)
+        data = realisation_to_dict(realisation)
+        response = site_request('POST', f"/api/realisations/{realisation.id}", endpoint_class,
+                                json=data, headers=get_api_headers(), timeout=10)
         if response.status_code in [200, 201]:
             realisation.last_sync = datetime.utcnow()
             realisation.sync_status = 'success'
@@ -170,21 +400,13 @@ def sync_realisation_to_site(realisation):
         db.session.commit()
         return False, str(e)[:50]
 
-def sync_annonce_to_site(annonce):
+def sync_annonce_to_site(annonce, endpoint_class='interactive'):
     if not API_KEY or not annonce.est_active:
         return False, "Non synchronisé"
     try:
-        data = {
-            'id': str(annonce.id),
-            'titre': annonce.titre,
-            'contenu': annonce.contenu or '',
-            'type_annonce': annonce.type_annonce or 'info',
-            'date_debut': annonce.date_debut.isoformat() if annonce.date_debut else None,
-            'date_fin': annonce.date_fin.isoformat() if annonce.date_fin else None,
-            'date_creation': annonce.date_creation.isoformat() if annonce.date_creation else datetime.utcnow().isoformat(),
-            'est_active': annonce.est_active
-        }
-        response = requests.post(f"{SITE_URL}/api/annonces/{annonce.id}", json=data, headers=get_api_headers(), timeout=10)
+        data = annonce_to_dict(annonce)
+        response = site_request('POST', f"/api/annonces/{annonce.id}", endpoint_class,
+                                json=data, headers=get_api_headers(), timeout=10)
         if response.status_code in [200, 201]:
             annonce.last_sync = datetime.utcnow()
             annonce.sync_status = 'success'
@@ -197,21 +419,13 @@ def sync_annonce_to_site(annonce):
         db.session.commit()
         return False, str(e)[:50]
 
-def sync_offre_to_site(offre):
+def sync_offre_to_site(offre, endpoint_class='interactive'):
     if not API_KEY or not offre.est_active:
         return False, "Non synchronisé"
     try:
-        data = {
-            'id': str(offre.id),
-            'titre': offre.titre,
-            'description': offre.description or '',
-            'type_offre': offre.type_offre or 'autre',
-            'lieu': offre.lieu or '',
-            'date_limite': offre.date_limite.isoformat() if offre.date_limite else None,
-            'date_creation': offre.date_creation.isoformat() if offre.date_creation else datetime.utcnow().isoformat(),
-            'est_active': offre.est_active
-        }
-        response = requests.post(f"{SITE_URL}/api/offres/{offre.id}", json=data, headers=get_api_headers(), timeout=10)
+        data = offre_to_dict(offre)
+        response = site_request('POST', f"/api/offres/{offre.id}", endpoint_class,
+                                json=data, headers=get_api_headers(), timeout=10)
         if response.status_code in [200, 201]:
             offre.last_sync = datetime.utcnow()
             offre.sync_status = 'success'
@@ -228,12 +442,282 @@ def delete_from_site(model_type, item_id):
     if not API_KEY:
         return False, "Clé API non configurée"
     try:
-        url = f"{SITE_URL}/api/{model_type}s/{item_id}"
-        response = requests.delete(url, headers=get_api_headers(), timeout=10)
+        response = site_request('DELETE', f"/api/{model_type}s/{item_id}", 'delete',
+                                headers=get_api_headers(), timeout=10)
         return response.status_code in [200, 204], "Supprimé" if response.status_code in [200, 204] else f"Erreur {response.status_code}"
     except Exception as e:
         return False, str(e)[:50]
 
+# --- JOURNAL DES MODIFICATIONS ---
+# type -> (modèle, sérialisation, visible sur le site principal)
+CHANGE_FEED_MODELS = {
+    'activite': (Activite, activite_to_dict, lambda item: item.est_publie),
+    'realisation': (Realisation, realisation_to_dict, lambda item: True),
+    'annonce': (Annonce, annonce_to_dict, lambda item: item.est_active),
+    'offre': (Offre, offre_to_dict, lambda item: item.est_active),
+}
+CHANGE_TYPES = {model: type for type, (model, _, _) in CHANGE_FEED_MODELS.items()}
+SYNC_COLUMNS = {'last_sync', 'sync_status', 'sync_message'}
+CHANGE_LOG_LOCK_KEY = 0x6c61626d  # 'labm'
+
+def lock_change_log(connection):
+    """Sérialise les écritures du journal jusqu'à la fin de la transaction.
+
+    Le curseur est l'id de l'entrée : il doit suivre l'ordre des commits. Sous
+    PostgreSQL, un verrou consultatif empêche une transaction qui valide plus tard
+    d'obtenir un id plus petit. SQLite n'accepte déjà qu'un écrivain à la fois.
+    """
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': CHANGE_LOG_LOCK_KEY})
+
+def change_operation(item):
+    # Un élément dépublié ou inactif est une suppression pour le site principal
+    return 'upsert' if CHANGE_FEED_MODELS[CHANGE_TYPES[type(item)]][2](item) else 'delete'
+
+@event.listens_for(db.session, 'after_flush')
+def record_changes(session, flush_context):
+    """Enregistre chaque écriture dans le journal, une seule entrée par élément"""
+    changes = []
+    for item in session.new:
+        if type(item) in CHANGE_TYPES:
+            changes.append((CHANGE_TYPES[type(item)], item.id, change_operation(item)))
+    for item in session.dirty:
+        if type(item) not in CHANGE_TYPES:
+            continue
+        state = db.inspect(item)
+        # Les mises à jour du statut de synchronisation ne sont pas des modifications
+        if any(state.attrs[attr.key].history.has_changes()
+               for attr in state.mapper.column_attrs if attr.key not in SYNC_COLUMNS):
+            changes.append((CHANGE_TYPES[type(item)], item.id, change_operation(item)))
+    for item in session.deleted:
+        if type(item) in CHANGE_TYPES:
+            changes.append((CHANGE_TYPES[type(item)], item.id, 'delete'))
+    if not changes:
+        return
+
+    table = ChangeLog.__table__
+    connection = session.connection()
+    lock_change_log(connection)
+    now = datetime.utcnow()
+    for type_, item_id, operation in changes:
+        connection.execute(table.delete().where(table.c.type == type_, table.c.item_id == item_id))
+        connection.execute(table.insert().values(type=type_, item_id=item_id, operation=operation, date_creation=now))
+
+def seed_change_log():
+    """Remplit le journal avec les éléments existants s'il est vide.
+
+    Tous les workers gunicorn l'exécutent au démarrage : le verrou du journal et
+    l'insertion qui ignore les doublons garantissent une seule entrée par élément.
+    """
+    lock_change_log(db.session.connection())
+    if ChangeLog.query.first() is not None:
+        db.session.commit()
+        return
+    now = datetime.utcnow()
+    rows = [{'type': type, 'item_id': item.id, 'operation': change_operation(item), 'date_creation': now}
+            for type, (model, _, _) in CHANGE_FEED_MODELS.items()
+            for item in model.query.order_by(model.id)]
+    if not rows:
+        db.session.commit()
+        return
+
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(ChangeLog.__table__).on_conflict_do_nothing(index_elements=['type', 'item_id'])
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(ChangeLog.__table__).on_conflict_do_nothing(index_elements=['type', 'item_id'])
+    else:
+        statement = insert(ChangeLog.__table__)
+    try:
+        db.session.execute(statement, rows)
+        db.session.commit()
+    except IntegrityError:
+        # Un autre worker a rempli le journal entre-temps
+        db.session.rollback()
+
+# --- CACHE DES FRAGMENTS DU TABLEAU DE BORD ---
+FRAGMENT_TYPES = ('activite', 'realisation', 'annonce', 'offre')
+
+class FragmentCache:
+    """Cache LRU des fragments HTML du tableau de bord.
+
+    Chaque fragment déclare les types de contenu dont il dépend. La clé de cache
+    contient la génération courante de ces types : invalider un type incrémente
+    sa génération, ce qui rend obsolètes uniquement les fragments concernés.
+    Si `path` est fourni, générations et fragments sont partagés entre les
+    workers gunicorn via un fichier SQLite ; les fragments expirent alors après
+    `shared_ttl` secondes, au cas où une invalidation n'a pas pu être écrite.
+    Sinon les invalidations restent locales au processus et chaque fragment
+    expire après `ttl` secondes.
+    """
+
+    def __init__(self, max_entries, max_bytes, path=None, ttl=None, shared_ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.ttl = shared_ttl if path else ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS fragment_generations '
+                             '(type TEXT PRIMARY KEY, generation INTEGER NOT NULL)')
+                conn.execute('CREATE TABLE IF NOT EXISTS fragments '
+                             '(key TEXT PRIMARY KEY, deps TEXT NOT NULL, html TEXT NOT NULL, '
+                             'size INTEGER NOT NULL, accessed REAL NOT NULL, '
+                             'created REAL NOT NULL DEFAULT 0)')
+                columns = [row[1] for row in conn.execute('PRAGMA table_info(fragments)')]
+                if 'created' not in columns:
+                    conn.execute('ALTER TABLE fragments ADD COLUMN created REAL NOT NULL DEFAULT 0')
+
+    @contextmanager
+    def _connect(self):
+        # `with conn` ne fait que valider la transaction : fermer explicitement
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, name, deps, generations):
+        return name + ':' + ':'.join(f"{t}{generations.get(t, 0)}" for t in deps)
+
+    def _get_generations(self, deps):
+        if not self.path:
+            with self._lock:
+                return dict(self._generations)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT type, generation FROM fragment_generations WHERE type IN ({','.join('?' * len(deps))})",
+                deps).fetchall()
+        return dict(rows)
+
+    def _store_local(self, key, deps, html, size, created=None):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[2]
+            expires = (created or time.time()) + self.ttl if self.ttl is not None else None
+            self._entries[key] = (deps, html, size, expires)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._size -= self._entries.popitem(last=False)[1][2]
+
+    def _store_shared(self, key, deps, html, size):
+        with self._connect() as conn:
+            now = time.time()
+            conn.execute('INSERT OR REPLACE INTO fragments (key, deps, html, size, accessed, created) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         (key, ',' + ','.join(deps) + ',', html, size, now, now))
+            conn.execute('DELETE FROM fragments WHERE key IN ('
+                         'SELECT key FROM (SELECT key, ROW_NUMBER() OVER w AS rang, SUM(size) OVER w AS cumul '
+                         'FROM fragments WINDOW w AS (ORDER BY accessed DESC)) '
+                         'WHERE rang > ? OR cumul > ?)',
+                         (self.max_entries, self.max_bytes))
+
+    def get_or_render(self, name, deps, render):
+        """Retourne le fragment `name` depuis le cache, ou le calcule via `render()`."""
+        try:
+            key = self._key(name, deps, self._get_generations(deps))
+        except sqlite3.Error:
+            return Markup(render())
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] is not None and entry[3] <= time.time():
+                self._size -= self._entries.pop(key)[2]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return Markup(entry[1])
+
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute('SELECT html, size, created FROM fragments WHERE key = ? AND created > ?',
+                                       (key, time.time() - self.ttl)).fetchone()
+                    if row:
+                        conn.execute('UPDATE fragments SET accessed = ? WHERE key = ?', (time.time(), key))
+            except sqlite3.Error:
+                row = None
+            if row:
+                self._store_local(key, deps, row[0], row[1], row[2])
+                return Markup(row[0])
+
+        html = str(render())
+        size = len(html.encode('utf-8'))
+        self._store_local(key, deps, html, size)
+        if self.path and size <= self.max_bytes:
+            try:
+                self._store_shared(key, deps, html, size)
+            except sqlite3.Error:
+                pass
+        return Markup(html)
+
+    def invalidate(self, type):
+        """Invalide les fragments qui dépendent du type de contenu donné."""
+        with self._lock:
+            self._generations[type] = self._generations.get(type, 0) + 1
+            for key in [k for k, entry in self._entries.items() if type in entry[0]]:
+                self._size -= self._entries.pop(key)[2]
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    conn.execute('INSERT INTO fragment_generations (type, generation) VALUES (?, 1) '
+                                 'ON CONFLICT(type) DO UPDATE SET generation = generation + 1', (type,))
+                    conn.execute('DELETE FROM fragments WHERE deps LIKE ?', (f"%,{type},%",))
+            except sqlite3.Error as e:
+                print(f"⚠️ Invalidation du cache partagé impossible ({type}), "
+                      f"fragments périmés au plus {self.ttl:g}s: {e}")
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'],
+                               app.config['FRAGMENT_CACHE_MAX_BYTES'],
+                               app.config['FRAGMENT_CACHE_PATH'],
+                               app.config['FRAGMENT_CACHE_TTL'],
+                               app.config['FRAGMENT_CACHE_SHARED_TTL'])
+if not app.config['FRAGMENT_CACHE_PATH'] and int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+    print(f"⚠️ Cache des fragments local à chaque worker : le tableau de bord peut avoir "
+          f"{app.config['FRAGMENT_CACHE_TTL']:g}s de retard (définir FRAGMENT_CACHE_PATH)")
+
+def get_dashboard_stats():
+    return {
+        'activities_count': Activite.query.count(),
+        'realisations_count': Realisation.query.count(),
+        'annonces_count': Annonce.query.count(),
+        'offres_count': Offre.query.count(),
+        'activities_published': Activite.query.filter_by(est_publie=True).count(),
+        'annonces_active': Annonce.query.filter_by(est_active=True).count(),
+        'offres_active': Offre.query.filter_by(est_active=True).count(),
+        'sync_failed': Activite.query.filter_by(sync_status='failed').count() +
+                      Realisation.query.filter_by(sync_status='failed').count() +
+                      Annonce.query.filter_by(sync_status='failed').count() +
+                      Offre.query.filter_by(sync_status='failed').count()
+    }
+
+def render_dashboard_fragments():
+    """Fragments du tableau de bord, recalculés seulement après une écriture sur leur type"""
+    return {
+        'stats_cards': fragment_cache.get_or_render(
+            'stats_cards', FRAGMENT_TYPES,
+            lambda: render_template('fragments/stats_cards.html', stats=get_dashboard_stats())),
+        'recent_activites': fragment_cache.get_or_render(
+            'recent_activites', ('activite',),
+            lambda: render_template('fragments/recent_activites.html',
+                                    recent_activities=Activite.query.order_by(Activite.date_creation.desc()).limit(5).all())),
+        'recent_annonces': fragment_cache.get_or_render(
+            'recent_annonces', ('annonce',),
+            lambda: render_template('fragments/recent_annonces.html',
+                                    recent_annonces=Annonce.query.order_by(Annonce.date_creation.desc()).limit(5).all())),
+        'table_activites': fragment_cache.get_or_render(
+            'table_activites', ('activite',),
+            lambda: render_template('fragments/table_activites.html',
+                                    activites=Activite.query.order_by(Activite.date_creation.desc()).all())),
+    }
+
 # --- ROUTES AUTHENTIFICATION ---
 @app.route('/')
 def index():
@@ -272,47 +756,22 @@ def logout():
 def admin_panel():
     """Interface admin unique avec toutes les sections"""
     try:
-        # Statistiques pour le dashboard
-        stats = {
-            'activities_count': Activite.query.count(),
-            'realisations_count': Realisation.query.count(),
-            'annonces_count': Annonce.query.count(),
-            'offres_count': Offre.query.count(),
-            'activities_published': Activite.query.filter_by(est_publie=True).count(),
-            'annonces_active': Annonce.query.filter_by(est_active=True).count(),
-            'offres_active': Offre.query.filter_by(est_active=True).count(),
-            'sync_failed': Activite.query.filter_by(sync_status='failed').count() +
-                          Realisation.query.filter_by(sync_status='failed').count() +
-                          Annonce.query.filter_by(sync_status='failed').count() +
-                          Offre.query.filter_by(sync_status='failed').count()
-        }
-        
         # Vérification connexion site principal
         site_connected, site_message = check_site_connection()
-        stats['site_connected'] = site_connected
-        stats['site_message'] = site_message
-        stats['api_key_configured'] = bool(API_KEY)
-        
-        # Récupérer toutes les données pour l'admin
-        activites = Activite.query.order_by(Activite.date_creation.desc()).all()
-        realisations = Realisation.query.order_by(Realisation.date_creation.desc()).all()
-        annonces = Annonce.query.order_by(Annonce.date_creation.desc()).all()
-        offres = Offre.query.order_by(Offre.date_creation.desc()).all()
+        stats = {
+            'site_connected': site_connected,
+            'site_message': site_message,
+            'api_key_configured': bool(API_KEY)
+        }
         
-        # 5 derniers éléments
-        recent_activities = activites[:5]
-        recent_annonces = annonces[:5]
+        # Statistiques, listes récentes et tableaux : fragments mis en cache
+        fragments = render_dashboard_fragments()
         
         return render_template('admin.html',
                               stats=stats,
+                              fragments=fragments,
                               now=datetime.utcnow(),
                               site_url=SITE_URL,
-                              activites=activites,
-                              realisations=realisations,
-                              annonces=annonces,
-                              offres=offres,
-                              recent_activities=recent_activities,
-                              recent_annonces=recent_annonces,
                               session=session)
                               
     except Exception as e:
@@ -321,7 +780,8 @@ def admin_panel():
                               error=str(e),
                               now=datetime.utcnow(),
                               site_url=SITE_URL,
-                              stats={})
+                              stats={},
+                              fragments={})
 
 # --- ROUTES API POUR LE FORMULAIRE UNIQUE ---
 
@@ -414,6 +874,7 @@ def api_nouveau(type):
         else:
             return jsonify({'success': False, 'message': 'Type inconnu'}), 400
             
+        fragment_cache.invalidate(type)
         return jsonify({
             'success': True,
             'id': item.id,
@@ -522,6 +983,7 @@ def api_modifier(type, id):
         else:
             return jsonify({'success': False, 'message': 'Type inconnu'}), 400
             
+        fragment_cache.invalidate(type)
         return jsonify({
             'success': True,
             'message': message
@@ -562,6 +1024,7 @@ def api_supprimer(type, id):
             return jsonify({'success': False, 'message': 'Type inconnu'}), 400
             
         db.session.commit()
+        fragment_cache.invalidate(type)
         return jsonify({'success': True, 'message': 'Supprimé'})
         
     except Exception as e:
@@ -588,6 +1051,7 @@ def api_sync(type, id):
         else:
             return jsonify({'success': False, 'message': 'Type inconnu'}), 400
             
+        fragment_cache.invalidate(type)
         return jsonify({'success': success, 'message': message})
         
     except Exception as e:
@@ -609,8 +1073,8 @@ def upload_image():
         files = {'file': (file.filename, file.stream, file.mimetype)}
         headers = {'X-API-Key': API_KEY}
         
-        response = requests.post(
-            f"{SITE_URL}/api/upload",
+        response = site_request(
+            'POST', '/api/upload',
             files=files,
             headers=headers,
             timeout=30
@@ -625,32 +1089,60 @@ def upload_image():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 # --- ROUTES DE SYNCHRONISATION MANUELLE ---
+# Une seule synchronisation complète à la fois par processus
+sync_all_lock = threading.Lock()
+
+def run_sync_all():
+    """Synchronise tous les éléments en arrière-plan, au rythme de la classe `bulk`"""
+    with app.app_context():
+        try:
+            total = 0
+            success_count = 0
+            for type, (model, sync) in [('activite', (Activite, sync_activite_to_site)),
+                                        ('realisation', (Realisation, sync_realisation_to_site)),
+                                        ('annonce', (Annonce, sync_annonce_to_site)),
+                                        ('offre', (Offre, sync_offre_to_site))]:
+                query = model.query
+                if type == 'activite':
+                    query = query.filter_by(est_publie=True)
+                elif type in ('annonce', 'offre'):
+                    query = query.filter_by(est_active=True)
+                # Les ids seulement : chaque commit expire les objets chargés, et un élément
+                # peut être supprimé pendant que la synchronisation attend son tour
+                ids = [row.id for row in query.with_entities(model.id).all()]
+                total += len(ids)
+                for item_id in ids:
+                    try:
+                        item = db.session.get(model, item_id)
+                        if item is None:
+                            continue
+                        if sync(item, 'bulk')[0]: success_count += 1
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"⚠️ Synchronisation complète: {type} {item_id} ignoré: {str(e)[:100]}")
+                # Les statuts de synchronisation de ce type ont changé
+                fragment_cache.invalidate(type)
+            print(f"✅ Synchronisation complète: {success_count}/{total} éléments synchronisés")
+        except Exception as e:
+            print(f"❌ Synchronisation complète: {str(e)}")
+            for type in FRAGMENT_TYPES:
+                fragment_cache.invalidate(type)
+        finally:
+            sync_all_lock.release()
+
 @app.route('/sync/all')
 @login_required
 def sync_all():
-    """Synchroniser tous les éléments"""
-    try:
-        activites = Activite.query.filter_by(est_publie=True).all()
-        realisations = Realisation.query.all()
-        annonces = Annonce.query.filter_by(est_active=True).all()
-        offres = Offre.query.filter_by(est_active=True).all()
-        
-        total = len(activites) + len(realisations) + len(annonces) + len(offres)
-        success_count = 0
-        
-        for item in activites:
-            if sync_activite_to_site(item)[0]: success_count += 1
-        for item in realisations:
-            if sync_realisation_to_site(item)[0]: success_count += 1
-        for item in annonces:
-            if sync_annonce_to_site(item)[0]: success_count += 1
-        for item in offres:
-            if sync_offre_to_site(item)[0]: success_count += 1
-            
-        flash(f'✅ {success_count}/{total} éléments synchronisés', 'success')
-        
-    except Exception as e:
-        flash(f'❌ Erreur: {str(e)}', 'danger')
+    """Lancer la synchronisation de tous les éléments en arrière-plan"""
+    if not sync_all_lock.acquire(blocking=False):
+        flash('⏳ Synchronisation déjà en cours', 'info')
+    else:
+        try:
+            threading.Thread(target=run_sync_all, name='sync-all', daemon=True).start()
+            flash('🔄 Synchronisation lancée en arrière-plan', 'info')
+        except Exception as e:
+            sync_all_lock.release()
+            flash(f'❌ Erreur: {str(e)}', 'danger')
         
     return redirect(url_for('admin_panel'))
 
@@ -666,6 +1158,63 @@ def api_health():
         'site_message': site_message
     })
 
+@app.route('/api/outbound/metrics')
+@login_required
+def api_outbound_metrics():
+    """Temps d'attente des appels vers le site principal, par classe"""
+    return jsonify(outbound_scheduler.metrics())
+
+@app.route('/api/changes')
+@api_key_required
+def api_changes():
+    """Modifications depuis le curseur `since`, au format NDJSON"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', app.config['CHANGES_PAGE_SIZE']))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Paramètres since et limit entiers attendus'}), 400
+    if since < 0:
+        return jsonify({'success': False, 'message': 'Curseur since invalide'}), 400
+    limit = max(1, min(limit, app.config['CHANGES_PAGE_MAX']))
+    
+    entries = ChangeLog.query.filter(ChangeLog.id > since).order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_cursor = entries[-1].id if entries else since
+    
+    # Toute modification d'un élément crée une nouvelle entrée : les ids suffisent
+    etag = hashlib.sha1(f"{since}:{','.join(str(e.id) for e in entries)}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        items = {}
+        for type, (model, _, _) in CHANGE_FEED_MODELS.items():
+            ids = [e.item_id for e in entries if e.type == type and e.operation == 'upsert']
+            if ids:
+                for item in model.query.filter(model.id.in_(ids)):
+                    items[(type, item.id)] = item
+        
+        def generate():
+            for entry in entries:
+                item = items.get((entry.type, entry.item_id))
+                line = {
+                    'cursor': entry.id,
+                    'type': entry.type,
+                    'id': str(entry.item_id),
+                    'operation': entry.operation if item is not None else 'delete',
+                    'date': entry.date_creation.isoformat() if entry.date_creation else None
+                }
+                if item is not None:
+                    line['data'] = CHANGE_FEED_MODELS[entry.type][1](item)
+                yield json.dumps(line, ensure_ascii=False) + '\n'
+        
+        response = app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    response.set_etag(etag)
+    response.headers['X-Next-Cursor'] = str(next_cursor)
+    response.headers['X-Has-More'] = 'true' if has_more else 'false'
+    return response
+
 # --- GESTION DES ERREURS ---
 @app.errorhandler(404)
 def page_not_found(e):
@@ -686,6 +1235,7 @@ with app.app_context():
     
     # Créer les tables
     db.create_all()
+    seed_change_log()
     
     # Supprimer les colonnes problématiques
     try: